@@ -1,10 +1,12 @@
+from functools import lru_cache
+
 import dash as dash
 import dash_core_components as dcc 
 import dash_html_components as html 
 from dash.dependencies import Input, Output, State
-import plotly.graph_objs as go 
+from dash.exceptions import PreventUpdate
 
-import scipy.stats as stats
+from scipy.special import betaln, btdtri
 import numpy as np
 
 
@@ -22,6 +24,60 @@ app.css.append_css({
 # global variables
 conf_interval_values = [0.99, 0.95, 0.90, 0.80] 
 
+# static plot values, built once and shared by every callback
+X_PLOT = np.linspace(0.0, 1.0, 202)[1:-1]    # x values for plotting the PDF, 200 interior points so the log-PDF is always finite
+X_PLOT.flags.writeable = False          # make accidental in-place changes fail loudly
+X_PLOT_LIST = X_PLOT.tolist()           # plain list copy for the figure, so the JSON encoder skips the ndarray path
+TICKVALS = [round(0.1 * i, 2) for i in range(11)]
+
+# static parts of the figure, the callback only fills in the x/y values
+# kept as plain JSON-ready dicts so no plotly.graph_objs validation runs on each call
+# plotly trace for PDF graph
+_POSTERIOR_TRACE = {
+    'type': 'scatter',
+    'mode': 'lines',
+    'name': 'posterior_trace',
+    'x': X_PLOT_LIST    # only this trace carries the full grid, the bound lines use 2 points each
+    #'fill': 'tozeroy',
+    #'line': dict(color=(colors['aqua blue']))
+}
+# plotly trace for LB line
+_LB_TRACE = {
+    'type': 'scatter',
+    'mode': 'lines',
+    'name': 'Lower Confidence Bound',
+    'line': {'color':'#f73d3d', 'width':2},
+    'text': ['Lower Confidence Bound', 'Lower Confidence Bound'],
+    #'hoverinfo': 'text'
+}
+# plotly trace for UB line
+_UB_TRACE = {
+    'type': 'scatter',
+    'mode': 'lines',
+    'name': 'Upper Confidence Bound',
+    'line': {'color':'#f73d3d', 'width':2},
+    'text': ['Upper Confidence Bound','Upper Confidence Bound'],
+    #'hoverinfo': 'text'
+}
+# plot layout
+_LAYOUT = {
+    'title': 'Winning Probability Distribution',
+    'yaxis': {
+        'title': 'Likelihood'
+        #'hoverformat': ',.1f'
+    },
+    'xaxis': {
+        'title': 'Probability of Winning',
+        'range': [0, 1],    # the grid stops just short of 0 and 1, keep the full axis shown
+        'tickvals': TICKVALS
+        #'tickformat': '.2%',
+        #'hoverformat': '.2%'
+    },
+    'showlegend': False
+    #'plot_bgcolor': colors['light_latte'],
+    #'paper_bgcolor': colors['light_ceramic']
+}
+
 # define app layout
 app.layout = html.Div([
     html.Div([
@@ -80,6 +136,46 @@ app.layout = html.Div([
 ])
 
 
+# helper functions
+def _as_number(value):
+    '''returns an input box value as an int when it is a whole number, otherwise as a float (empty boxes come through as None).'''
+    value = float(value or 0)
+    return int(value) if value.is_integer() else value
+
+
+def _beta_pdf(x, a, b):
+    '''returns the Beta(a, b) PDF evaluated at x (a scalar or a numpy array), with 0 < x < 1.
+    computed in log space so large a, b don't underflow, log1p(-x) keeps precision for small x.'''
+    return np.exp((a - 1) * np.log(x) + (b - 1) * np.log1p(-x) - betaln(a, b))
+
+
+@lru_cache(maxsize=8192)
+def _ppf(a, b, q):
+    '''returns the Beta(a, b) PPF at q (btdtri is the inverse of the Beta CDF).
+    the dropdown only offers a few confidence intervals, so there are few distinct q values per (a, b) and results are cached.'''
+    return float(btdtri(a, b, q))
+
+
+@lru_cache(maxsize=256)
+def _beta_curve(a, b):
+    '''returns the y values of the Beta(a, b) PDF curve over X_PLOT and the peak height of the curve.
+    results are cached, so the array is marked read-only since it is shared between calls.'''
+    
+    # get range of values for plotting using the PDF
+    y_plot = _beta_pdf(X_PLOT, a, b)
+    y_plot.flags.writeable = False
+    
+    # get the max height of the PDF curve, used for the height of the bound lines
+    # when a, b > 1 the peak is at the mode (a-1)/(a+b-2), so evaluate the PDF there exactly
+    if a > 1 and b > 1:
+        mode = (a - 1) / (a + b - 2)
+        line_height = _beta_pdf(mode, a, b)
+    else:
+        line_height = y_plot.max()    # the peak is at an edge of the grid
+    
+    return y_plot, line_height
+
+
 # dash dynamic functions
 @app.callback(
     Output(component_id='pdf_graph', component_property='figure'),
@@ -90,111 +186,70 @@ app.layout = html.Div([
 def update_graph(n_clicks, prior_wins, prior_losses, observed_wins, observed_losses, conf_interval):
     '''updates the graph based on the latest inputted data.'''
     
-    # update the priors with the observed data to get the posterior
-    posterior_beta = stats.beta(prior_wins + observed_wins, prior_losses + observed_losses)
+    # coerce the inputs once, whole numbers become ints so they share cache entries
+    prior_wins, prior_losses, observed_wins, observed_losses = map(_as_number, (prior_wins, prior_losses, observed_wins, observed_losses))
     
-    # get range of values for plotting using the PDF
-    x_plot = np.linspace(0, 1, 200)
-    y_plot = [posterior_beta.pdf(i) for i in x_plot]
+    # update the priors with the observed data to get the posterior Beta(a, b) parameters
+    a = prior_wins + observed_wins
+    b = prior_losses + observed_losses
+    
+    # get the PDF curve (cached, so repeat clicks and confidence interval changes skip the math)
+    y_plot, line_height = _beta_curve(a, b)
     
     # get the confidence intervals using the PPF
     conf_interval_val = 1 - conf_interval
-    lb = posterior_beta.ppf(0 + conf_interval_val / 2)
-    ub = posterior_beta.ppf(1 - conf_interval_val / 2)
-    
-    # set up plotly trace for PDF graph  
-    posterior_trace = go.Scatter(
-        x = x_plot,
-        y = y_plot,
-        mode='lines',
-        name='posterior_trace'
-        #fill='tozeroy',
-        #line=dict(color=(colors['aqua blue']))
-    )
-    
-    # set up plotly traces for lower/upper bound vertical lines
-    # get height of lines
-    line_height = max(y_plot)   # get the max height of the PDF curve from above
-    
-    # set up plotly trace for LB line
-    lb_trace = go.Scatter(
-        x = [lb, lb],
-        y = [0, line_height],
-        mode = 'lines',
-        name='Lower Confidence Bound',
-        line={'color':'#f73d3d', 'width':2},
-        text = ['Lower Confidence Bound', 'Lower Confidence Bound'],
-        #hoverinfo = 'text'
-        )
-    # set up plotly trace for UB line
-    ub_trace = go.Scatter(
-        x = [ub, ub],
-        y = [0, line_height],
-        mode = 'lines',
-        name='Upper Confidence Bound',
-        line={'color':'#f73d3d', 'width':2},
-        text = ['Upper Confidence Bound','Upper Confidence Bound'],
-        #hoverinfo = 'text'
-        )
-    
-    # put all traces into a list
-    data = [posterior_trace, lb_trace, ub_trace]
-    
-    # define plot layout
-    layout = go.Layout(
-        title='Winning Probability Distribution',
-        yaxis= dict(
-            title='Likelihood'
-            #hoverformat=',.1f'
-        ),
-        xaxis = dict(
-            title='Probability of Winning',
-            tickvals=[round(0.1 * i,2) for i in range(0,11)]  
-            #tickformat='.2%',
-            #hoverformat='.2%'
-        ),
-        showlegend=False
-        #plot_bgcolor=colors['light_latte'],
-        #paper_bgcolor=colors['light_ceramic']
-    )
+    lb = _ppf(a, b, 0 + conf_interval_val / 2)
+    ub = _ppf(a, b, 1 - conf_interval_val / 2)
+    
+    # fill the PDF curve and the lower/upper bound vertical lines into the static trace settings
+    data = [
+        dict(_POSTERIOR_TRACE, y=y_plot),
+        dict(_LB_TRACE, x=[lb, lb], y=[0, line_height]),
+        dict(_UB_TRACE, x=[ub, ub], y=[0, line_height])
+    ]
     
     # return a dict with data and layout --> this will be passed into the 'figure' property of the dcc.Graph
-    return {'data': data,'layout': layout}
+    return {'data': data, 'layout': _LAYOUT}
                                 
 
 
-@app.callback(
-    Output(component_id='data_column', component_property='children'),
-    [Input(component_id='update_priors_button', component_property='n_clicks')],
-    [State(component_id=box, component_property='value') for box in ['prior_wins', 'prior_losses', 'observed_wins', 'observed_losses']]
-)
-def update_priors(n_clicks, prior_wins, prior_losses, observed_wins, observed_losses):
-    '''updates the priors by taking the current priors, adding the current observed data, and setting the results as the new priors.  then sets the observed data to 0.'''
+def update_prior(n_clicks, prior, observed):
+    '''updates a prior by taking the current prior, adding the current observed data, and setting the result as the new prior.'''
+    
+    # dash fires the callback once on page load before the button is clicked, skip that call
+    if n_clicks is None:
+        raise PreventUpdate
     
-    # create the new priors
-    new_prior_wins = prior_wins + observed_wins
-    new_prior_losses = prior_losses + observed_losses
+    # return only the new value of the prior input box
+    return _as_number(prior) + _as_number(observed)
 
-    # return the updated app layout with the new priors and observed data 
-    return [html.H3("Data Column"),
+
+def reset_observed(n_clicks):
+    '''sets the observed data to 0 once it has been added into the priors.'''
     
-    html.Div([
-        html.H4("Priors"),
-        html.P("Prior Wins"),
-        dcc.Input(id='prior_wins', value=new_prior_wins, type='number'),
-        html.P("Prior Losses"),
-        dcc.Input(id='prior_losses', value=new_prior_losses, type='number')
-    ], className='four columns'),
+    # dash fires the callback once on page load before the button is clicked, skip that call
+    if n_clicks is None:
+        raise PreventUpdate
     
-    html.Div([
-        html.H4("Observed"),
-        html.P("Observed Wins"),
-        dcc.Input(id='observed_wins', value=0, type='number'),
-        html.P("Observed Losses"),
-        dcc.Input(id='observed_losses', value=0, type='number')
-    ], className='four columns')]
+    return 0
+
+
+# register the priors update as one value-only callback per input box, since this version of dash allows a single Output per callback
+# all of them are triggered by the same click, so they all see the observed data from before it is reset
+for prior_box, observed_box in [('prior_wins', 'observed_wins'), ('prior_losses', 'observed_losses')]:
+    app.callback(
+        Output(component_id=prior_box, component_property='value'),
+        [Input(component_id='update_priors_button', component_property='n_clicks')],
+        [State(component_id=box, component_property='value') for box in [prior_box, observed_box]]
+    )(update_prior)
+    
+    app.callback(
+        Output(component_id=observed_box, component_property='value'),
+        [Input(component_id='update_priors_button', component_property='n_clicks')]
+    )(reset_observed)
 
 
 if __name__ == '__main__':
-    app.run_server(debug=True, threaded=True)
+    # local run only, deployments go through gunicorn using the Procfile (see `server` above)
+    app.run_server(debug=False)
     
\ No newline at end of file